@@ -96,7 +96,10 @@ def extract_json_from_response(response: str) -> dict:
     Extract and parse JSON from an LLM response.
     The response might have text before/after the JSON.
     Return the parsed dict, or {"error": "no json found"} if parsing fails.
-    Hint: use re.search with a pattern that matches {...}
+    Hint: a {...} regex can't count nested braces, and on long responses a
+    greedy one backtracks. Instead walk forward from the first '{', counting
+    '{' and '}' (skipping over "strings", and \\" escapes inside them) until
+    the count is back to zero — one pass — then json.loads that span.
     """
     import re, json
     # YOUR CODE HERE
@@ -5,6 +5,8 @@ Run: python exercises/exercises_10.py
 """
 import re
 import json
+import hashlib
+import tempfile
 import numpy as np
 
 
@@ -39,9 +41,13 @@ class DocumentRetriever:
         pass
 
     def _embed(self, text: str) -> np.ndarray:
-        """Fake embedder — in production use sentence-transformers."""
-        np.random.seed(abs(hash(text)) % (2**31))
-        return np.random.randn(32)
+        """
+        Fake embedder — in production use sentence-transformers.
+        Seeded by blake2b(text), which (unlike hash()) is the same in every
+        process, and uses its own generator instead of the global np.random.
+        """
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(32)
 
     def add_document(self, doc: str):
         # YOUR CODE HERE
@@ -56,6 +62,198 @@ class DocumentRetriever:
         pass
 
 
+# ══════════════════════════════════════════════════════
+# EXERCISE 2 (extension): Compressed Storage — provided, read it through
+# ══════════════════════════════════════════════════════
+"""
+At scale, RAM (not CPU) is the limit: 10M docs x 384 float64 dims = 30 GB.
+Quantization stores a small CODE per vector instead of the floats:
+
+  int8 scalar quantization:  1 byte per dimension            →  8x smaller
+  product quantization (PQ): 1 byte per group of dimensions  → 32x smaller
+
+Queries stay full precision ("asymmetric" scoring), and the best candidates
+can be re-ranked exactly against their float vectors, which restores accuracy.
+Only those few rows are read, so the floats stay on disk (np.memmap).
+"""
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _kmeans(vectors: np.ndarray, k: int, n_iter: int = 15, seed: int = 0) -> np.ndarray:
+    """Plain k-means (squared L2). Returns k centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(n_iter):
+        dists = (centroids ** 2).sum(1) - 2 * vectors @ centroids.T
+        assign = dists.argmin(1)
+        for c in range(k):
+            members = vectors[assign == c]
+            if len(members):
+                centroids[c] = members.mean(0)
+    return centroids
+
+
+class ScalarQuantizer:
+    """Each dimension → int8, using a per-dimension scale learned by fit()."""
+
+    def __init__(self):
+        self.scale = None
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    def fit(self, vectors: np.ndarray):
+        self.scale = np.maximum(np.abs(vectors).max(0), 1e-8) / 127
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def score(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Dot products without decoding: fold the scale into the query once."""
+        return codes @ (query * self.scale).astype(np.float32)
+
+
+class ProductQuantizer:
+    """
+    Split each vector into n_subspaces chunks; each chunk is replaced by the
+    id (1 byte) of its nearest centroid in that subspace's codebook.
+    """
+
+    def __init__(self, n_subspaces: int = 8, n_centroids: int = 256):
+        self.m = n_subspaces
+        self.n_centroids = n_centroids
+        self.codebooks = None  # shape: (m, n_centroids, sub_dim)
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _split(self, vectors: np.ndarray) -> list:
+        return np.split(vectors, self.m, axis=-1)
+
+    def fit(self, vectors: np.ndarray):
+        k = min(self.n_centroids, len(vectors))
+        self.codebooks = np.stack([_kmeans(sub, k) for sub in self._split(vectors)])
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = [
+            ((book ** 2).sum(1) - 2 * sub @ book.T).argmin(1)
+            for sub, book in zip(self._split(vectors), self.codebooks)
+        ]
+        return np.stack(codes, axis=1).astype(np.uint8)
+
+    def score(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Asymmetric distance computation: one lookup table per subspace,
+        table[j, c] = query_chunk_j · centroid_c. A vector's score is then
+        the sum of m table lookups — no decoding, no float vectors needed.
+        """
+        tables = np.einsum("jd,jcd->jc", np.stack(self._split(query)), self.codebooks)
+        return tables[np.arange(self.m), codes].sum(1)
+
+
+class CompressedDocumentRetriever(DocumentRetriever):
+    """
+    DocumentRetriever that stores quantized codes instead of float vectors.
+
+    mode="int8" → ScalarQuantizer, mode="pq" → ProductQuantizer.
+    The quantizer is trained once `train_size` documents exist; until then
+    retrieve() scores their float vectors exactly, so an early query never
+    trains it on a handful of vectors.
+    rerank=N re-scores the best N*top_k candidates exactly (0 turns it off).
+    The float vectors live in a memory-mapped file (vector_file, or a temporary
+    file), so only the codes stay in RAM; a rerank reads just its N*top_k rows.
+    Codes and floats grow by doubling their capacity, not by re-stacking per add.
+    """
+
+    def __init__(self, mode: str = "int8", rerank: int = 4, n_subspaces: int = 8,
+                 train_size: int = 256, vector_file: str = None):
+        super().__init__()
+        if mode not in ("int8", "pq"):
+            raise ValueError(f"Unknown mode: {mode!r}")
+        self.quantizer = ScalarQuantizer() if mode == "int8" else ProductQuantizer(n_subspaces)
+        self.rerank = rerank
+        self.train_size = train_size
+        self.docs = []
+        self._file = open(vector_file, "w+b") if vector_file else tempfile.TemporaryFile()
+        self._vectors = None   # np.memmap of float32 unit vectors, capacity rows
+        self._codes = None     # preallocated codes, capacity rows
+        self._n = 0
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return None if self._vectors is None else self._vectors[:self._n]
+
+    @property
+    def codes(self) -> np.ndarray:
+        return None if self._codes is None else self._codes[:self._n]
+
+    def _grow(self, dim: int):
+        """Double the capacity of the float file (and of the codes, once there are any)."""
+        capacity = max(1024, 2 * self._n)
+        self._file.truncate(capacity * dim * 4)
+        self._vectors = np.memmap(self._file, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        if self._codes is not None:
+            codes = np.empty((capacity,) + self._codes.shape[1:], dtype=self._codes.dtype)
+            codes[:self._n] = self._codes[:self._n]
+            self._codes = codes
+
+    def _train(self):
+        """Fit the quantizer on every vector so far and encode them all."""
+        self.quantizer.fit(np.asarray(self.vectors))
+        codes = self.quantizer.encode(np.asarray(self.vectors))
+        self._codes = np.empty((len(self._vectors),) + codes.shape[1:], dtype=codes.dtype)
+        self._codes[:self._n] = codes
+
+    def add_document(self, doc: str):
+        vector = _unit(self._embed(doc))
+        if self._vectors is None or self._n == len(self._vectors):
+            self._grow(len(vector))
+        self.docs.append(doc)
+        self._vectors[self._n] = vector
+        if self.quantizer.trained:
+            self._codes[self._n] = self.quantizer.encode(vector[None])[0]
+        self._n += 1
+        if not self.quantizer.trained and self._n >= self.train_size:
+            self._train()
+
+    def retrieve(self, query: str, top_k: int = 3) -> list:
+        if not self.docs:
+            return []
+        q = _unit(self._embed(query))
+        if not self.quantizer.trained:   # small corpus: exact scores, nothing to compress yet
+            scores = self.vectors @ q
+            return [self.docs[i] for i in np.argsort(-scores)[:top_k]]
+        scores = self.quantizer.score(q, self.codes)
+        n_cand = min(len(scores), top_k * max(self.rerank, 1))
+        cand = np.argpartition(-scores, n_cand - 1)[:n_cand]
+        if self.rerank:
+            exact = self._vectors[np.sort(cand)] @ q   # reads only the candidates' rows
+            cand = np.sort(cand)[np.argsort(-exact)]
+        else:
+            cand = cand[np.argsort(-scores[cand])]
+        return [self.docs[i] for i in cand[:top_k]]
+
+    def size(self) -> int:
+        return len(self.docs)
+
+    def bytes_per_vector(self) -> float:
+        """
+        RAM per document vector: the code once trained (codebooks excluded). Before
+        that every query scans the float vectors, so those count as resident.
+        """
+        if not self._n:
+            return 0.0
+        if self._codes is None:
+            return float(self._vectors.itemsize * self._vectors.shape[1])
+        return float(self._codes.itemsize * np.prod(self._codes.shape[1:]))
+
+
 # ══════════════════════════════════════════════════════
 # EXERCISE 3: Input Guardrail
 # ══════════════════════════════════════════════════════
@@ -86,8 +284,9 @@ def parse_llm_classification(response: str) -> dict:
     "label" (str) and "confidence" (float 0-1).
 
     Steps:
-    1. Find the first {...} JSON block in the response
-    2. Parse it
+    1. Find the first JSON object in the response (find_json_object does
+       this for you, nested objects included)
+    2. If there isn't one, that's a failure
     3. Validate: "label" must be present, "confidence" must be 0-1 float
     4. Return {"ok": True, "label": ..., "confidence": ...}
        or {"ok": False, "error": "..."} on any failure
@@ -96,6 +295,82 @@ def parse_llm_classification(response: str) -> dict:
     pass
 
 
+# ══════════════════════════════════════════════════════
+# EXERCISE 4 (extension): Finding JSON in Noisy Responses — provided, read it through
+# ══════════════════════════════════════════════════════
+"""
+A {...} regex can't count braces: r"\{.*?\}" stops inside nested objects, and
+r"\{.*\}" runs to the LAST brace and backtracks on long responses. Instead,
+scan once, left to right:
+
+  - jump to a '{' that can open an object (next non-space char is '"' or '}')
+  - count depth on '{' / '}', but skip over "strings" (honouring \\" escapes),
+    so braces inside values don't count
+  - at depth 0, json.loads the span; if it isn't valid JSON, carry on AFTER it
+  - if it never closes (a truncated object, a stray '"'), try the next '{'
+
+Each pairing of braces is remembered, so retrying from the next '{' jumps over
+what was already matched instead of reading it again: the scan stays about
+O(n). The jumps and the string skips are regex calls, so most of it runs in C.
+"""
+
+_OBJECT_START = re.compile(r'\{\s*["}]')
+_STRUCTURE = re.compile(r'[{}"]')
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)   # after the opening quote
+
+
+def find_json_object(text: str, object_start=_OBJECT_START, structure=_STRUCTURE):
+    """The first complete, valid JSON object in text (as a dict), or None."""
+    ends = {}                                      # '{' position -> end of its object (None: never closes)
+    pos = 0
+    while start := object_start.search(text, pos):
+        end = _object_end(text, start.start(), ends, structure)
+        if end is None:
+            pos = start.start() + 1                # unterminated or unclosed: try the next opening
+            continue
+        try:
+            return json.loads(text[start.start():end])
+        except (json.JSONDecodeError, RecursionError):
+            pos = end                              # balanced but not JSON: skip it whole
+    return None
+
+
+def _object_end(text: str, i: int, ends: dict, structure=_STRUCTURE):
+    """
+    End of the object whose '{' is at i, or None if it never closes. Every brace
+    paired on the way is recorded in ends, so a later scan that reaches one jumps
+    over it instead of reading those characters again.
+    """
+    if i in ends:
+        return ends[i]
+    opened = []
+    while token := structure.search(text, i):
+        i = token.end()
+        if token.group() == '"':
+            string = _STRING_REST.match(text, i)
+            if string is None:
+                break                              # unterminated string: nothing can close
+            i = string.end()
+        elif token.group() == "}":
+            ends[opened.pop()] = i
+            if not opened:
+                return i
+        elif token.start() not in ends:
+            opened.append(token.start())
+        elif ends[token.start()] is None:
+            break
+        else:
+            i = ends[token.start()]
+    for brace in opened:
+        ends[brace] = None
+    return None
+
+
+def find_json_objects(responses) -> list:
+    """find_json_object over a batch of responses (None where there is no object)."""
+    return list(map(find_json_object, responses))
+
+
 # ══════════════════════════════════════════════════════
 # EXERCISE 5: Build a RAG Prompt
 # ══════════════════════════════════════════════════════
@@ -115,6 +390,67 @@ def build_rag_prompt(query: str, retrieved_docs: list, system_instruction: str)
 # ══════════════════════════════════════════════════════
 # TEST RUNNER
 # ══════════════════════════════════════════════════════
+def run_provided_tests(check):
+    """Checks for the code provided above; these pass before you write any of your own."""
+    # CompressedDocumentRetriever
+    float_bytes = DocumentRetriever()._embed("x").nbytes
+    for mode, min_ratio in (("int8", 8), ("pq", 32)):
+        cr = CompressedDocumentRetriever(mode=mode)
+        for i in range(300):
+            cr.add_document(f"document number {i}")
+        check(f"{mode} size", cr.size(), 300)
+        check(f"{mode} {min_ratio}x smaller", float_bytes / cr.bytes_per_vector() >= min_ratio, True)
+        check(f"{mode} finds exact doc", cr.retrieve("document number 42", top_k=1),
+              ["document number 42"])
+        early = CompressedDocumentRetriever(mode=mode)
+        for i in range(3):
+            early.add_document(f"early document {i}")
+        check(f"{mode} exact before training", early.retrieve("early document 1", top_k=1),
+              ["early document 1"])
+        for i in range(600):
+            early.add_document(f"later document {i}")
+        check(f"{mode} trains on the full set", early.quantizer.trained, True)
+        hits = sum(early.retrieve(f"later document {i}", top_k=1) == [f"later document {i}"]
+                   for i in range(0, 600, 6))
+        check(f"{mode} early query doesn't spoil recall", hits >= 95, True)
+
+    # find_json_object
+    check("json nested", find_json_object('Sure: {"a": {"b": [1, {"c": 2}]}} ok'),
+          {"a": {"b": [1, {"c": 2}]}})
+    check("json braces in strings", find_json_object('{"s": "} \\" {", "n": 1}'), {"s": '} " {', "n": 1})
+    check("json skips prose braces", find_json_object('Use {label} like {"label": "x"}'), {"label": "x"})
+    check("json none", find_json_object("no json {here}"), None)
+    check("json after unterminated string", find_json_object('Use {"x} then {"a": 1}'), {"a": 1})
+    check("json inside unclosed object", find_json_object('{"a": {"b": 1}, "c": '), {"b": 1})
+    check("json batch", find_json_objects(['{"x": 1}', "nothing"]), [{"x": 1}, None])
+
+    rng = np.random.default_rng(0)
+    noise = np.array(["lorem ", "ipsum, ", "{see above} ", "{a {b} c} ", "} ", '"quoted" ', "it's ", "\n",
+                      '{"not": json} '])
+    target = {"label": "positive", "confidence": 0.5, "nested": {"why": 'tone "}" {'}}
+    misses = 0
+    for trial in range(20):
+        prefix = "".join(rng.choice(noise, rng.integers(0, 200)))
+        suffix = "".join(rng.choice(noise, rng.integers(0, 50)))
+        misses += find_json_object(prefix + json.dumps(target) + suffix) != target
+    check("json fuzz finds the object", misses, 0)
+
+    class ScanCounter:   # characters the regexes scan: the work done (a timer would be flaky)
+        def __init__(self, pattern):
+            self.pattern, self.scanned = pattern, 0
+        def search(self, text, pos=0):
+            found = self.pattern.search(text, pos)
+            self.scanned += (found.end() if found else len(text)) - pos
+            return found
+
+    response = "".join(rng.choice(noise, 480_000)) + json.dumps(target)   # ~4 MB
+    counters = ScanCounter(_OBJECT_START), ScanCounter(_STRUCTURE)
+    found = find_json_object(response, *counters)
+    scanned = sum(c.scanned for c in counters) / len(response)
+    check("json multi-MB response", found, target)
+    check("json scans each char at most twice", scanned <= 2, True)   # a backtracking regex rescans
+
+
 def run_tests():
     passed = failed = 0
     def check(name, result, expected, tol=1e-4):
@@ -130,6 +466,7 @@ def run_tests():
             failed += 1
 
     print("\n=== MODULE 10 TESTS ===\n")
+    run_provided_tests(check)
 
     # cosine_similarity
     a = np.array([1., 0., 0.])
@@ -28,6 +28,11 @@ Example:
 This lets us find relevant documents by measuring vector similarity.
 """
 
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
 def cosine_similarity(vec_a, vec_b):
@@ -49,37 +54,509 @@ print("Similarity: Python vs Sky topic:", cosine_similarity(embedding_python_1,
 # PART 2: SIMPLE RAG FROM SCRATCH (no library)
 # ══════════════════════════════════════════════════════
 
+def top_k_indices(scores, top_k):
+    """
+    Indices of the top_k highest scores, best first.
+
+    np.argpartition finds the k best in O(n) instead of sorting all n scores.
+    The order matches `np.argsort(scores)[::-1][:top_k]`; exact ties go to the
+    larger index first (what a stable argsort, reversed, would give).
+    """
+    n = len(scores)
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    kth = np.argpartition(scores, n - top_k)[n - top_k]
+    candidates = np.flatnonzero(scores >= scores[kth])   # keeps every tie at the cut
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return candidates[order[:top_k]]
+
+
+def top_k_indices_many(scores, top_k):
+    """
+    top_k_indices for every row of a 2-D score matrix, without a Python loop:
+    one argpartition along axis 1, then only those k columns are sorted.
+    Rows with a tie at the cut (rare) go through top_k_indices, so the tie
+    order stays the same as for a single query.
+    """
+    n_rows, n = scores.shape
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int64)
+    top = np.argpartition(scores, n - top_k, axis=1)[:, n - top_k:]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    top = np.take_along_axis(top, np.lexsort((-top, -top_scores), axis=1), axis=1)
+    cut = np.take_along_axis(scores, top[:, -1:], axis=1)
+    for row in np.flatnonzero((scores >= cut).sum(axis=1) > top_k):
+        top[row] = top_k_indices(scores[row], top_k)
+    return top
+
+
+class VectorStore:
+    """
+    Every embedding lives in ONE contiguous float32 matrix, L2-normalized when
+    it is added. Cosine similarity against all documents is then a single
+    matrix-vector product: scores = matrix @ query.
+
+    Growing, deleting and updating never rebuild the index:
+      - the matrix is a buffer whose capacity DOUBLES when full, so n adds
+        copy O(n) rows in total (re-stacking on every add copies O(n²))
+      - delete() only sets a "tombstone" flag that search masks out
+      - compact() later drops tombstoned rows to reclaim the space
+    Each row has a stable id (ids are never reused and survive compact()).
+    """
+
+    def __init__(self, dim, capacity=1024):
+        self.dim = dim
+        self._lock = threading.Lock()        # one writer at a time
+        self._buffer = np.empty((capacity, dim), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._size = 0                       # rows in use, tombstones included
+        self._deleted = 0
+        self._next_id = 0
+        self._publish()
+
+    def _publish(self):
+        """
+        Searches read one consistent snapshot (matrix, ids, alive mask), so a
+        background compact() can swap in new arrays while queries keep running.
+        """
+        alive = self._alive[:self._size] if self._deleted else None
+        self._view = (self._buffer[:self._size], self._ids[:self._size], alive)
+
+    @property
+    def matrix(self):
+        return self._view[0]
+
+    def __len__(self):
+        return self._size - self._deleted
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _reserve(self, extra):
+        """Make room for `extra` rows, doubling capacity (also un-maps a loaded file)."""
+        needed = self._size + extra
+        if needed <= len(self._buffer) and self._buffer.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._buffer), 1024)
+        for name in ("_buffer", "_ids", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _rows(self, ids):
+        """Rows of live ids (ids stay sorted, so this is a binary search)."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        rows = np.minimum(np.searchsorted(self._ids[:self._size], ids), max(self._size - 1, 0))
+        if self._size == 0 or (self._ids[rows] != ids).any() or not self._alive[rows].all():
+            raise KeyError(f"Unknown or deleted id in {ids.tolist()}")
+        return rows
+
+    def add(self, vectors):
+        """Append a batch of vectors (shape: n x dim). Returns their new ids."""
+        vectors = self._normalize(np.atleast_2d(vectors))
+        with self._lock:
+            self._reserve(len(vectors))
+            rows = slice(self._size, self._size + len(vectors))
+            ids = np.arange(self._next_id, self._next_id + len(vectors))
+            self._buffer[rows], self._ids[rows], self._alive[rows] = vectors, ids, True
+            self._size += len(vectors)
+            self._next_id += len(vectors)
+            self._publish()
+        return ids
+
+    def delete(self, ids):
+        """O(1) per id: tombstone the rows, search skips them from now on."""
+        with self._lock:
+            rows = self._rows(np.unique(ids))   # a repeated id is deleted (and counted) once
+            self._reserve(0)
+            self._alive[rows] = False
+            self._deleted += len(rows)
+            self._publish()
+
+    def update(self, doc_id, vector):
+        """Overwrite a document's vector in place (e.g. after its text changed)."""
+        with self._lock:
+            row = self._rows(doc_id)[0]
+            self._reserve(0)
+            self._buffer[row] = self._normalize(vector)
+            self._publish()
+
+    def compact(self, background=False):
+        """
+        Drop tombstoned rows. With background=True it runs in a thread and
+        returns it; searches keep using the old snapshot until the swap.
+        """
+        if background:
+            thread = threading.Thread(target=self.compact, daemon=True)
+            thread.start()
+            return thread
+        with self._lock:
+            keep = np.flatnonzero(self._alive[:self._size])
+            capacity = max(1024, 2 * len(keep))
+            buffer = np.empty((capacity, self.dim), dtype=np.float32)
+            ids = np.empty(capacity, dtype=np.int64)
+            alive = np.zeros(capacity, dtype=bool)
+            buffer[:len(keep)], ids[:len(keep)], alive[:len(keep)] = \
+                self._buffer[keep], self._ids[keep], True
+            self._buffer, self._ids, self._alive = buffer, ids, alive
+            self._size, self._deleted = len(keep), 0
+            self._publish()
+
+    @staticmethod
+    def _top(scores, ids, alive, top_k):
+        if alive is not None:
+            scores[~alive] = -np.inf
+        top = top_k_indices(scores, top_k)
+        top = top[np.isfinite(scores[top])]
+        return ids[top], scores[top]
+
+    def search(self, query, top_k=3):
+        """Return (ids, scores) of the top_k most similar live rows."""
+        matrix, ids, alive = self._view
+        return self._top(matrix @ self._normalize(query), ids, alive, top_k)
+
+    def search_many(self, queries, top_k=3, block_bytes=64 * 2**20):
+        """
+        Top-k for many queries at once: (ids, scores), one row per query.
+        Each block of queries is ONE matrix-matrix product (GEMM), which BLAS
+        spreads over all cores. Blocks are sized so a block's score matrix
+        stays under `block_bytes`, however large the corpus.
+        """
+        matrix, ids, alive = self._view
+        queries = self._normalize(np.atleast_2d(queries))
+        top_k = min(top_k, len(matrix) if alive is None else int(alive.sum()))
+        out_ids = np.empty((len(queries), top_k), dtype=np.int64)
+        out_scores = np.empty((len(queries), top_k), dtype=np.float32)
+        rows_per_block = max(1, block_bytes // (4 * max(len(matrix), 1)))
+        for start in range(0, len(queries), rows_per_block):
+            block = queries[start:start + rows_per_block] @ matrix.T
+            if alive is not None:
+                block[:, ~alive] = -np.inf   # top_k counts live rows only, so none get picked
+            top = top_k_indices_many(block, top_k)
+            out_ids[start:start + len(block)] = ids[top]
+            out_scores[start:start + len(block)] = np.take_along_axis(block, top, axis=1)
+        return out_ids, out_scores
+
+    def live_ids(self):
+        _, ids, alive = self._view
+        return ids if alive is None else ids[alive]
+
+    def save(self, path):
+        """
+        Write the live rows as a raw .npy file (header + bytes, nothing to parse).
+        Tombstones are dropped; the loaded store numbers its rows 0..n-1.
+        """
+        matrix, _, alive = self._view
+        np.save(os.path.join(path, "embeddings.npy"), matrix if alive is None else matrix[alive])
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        mmap=True maps the file instead of reading it: loading is instant, pages
+        are pulled in on first use, and processes mapping the same file share
+        them. The mapped matrix is read-only; the first write copies it to RAM.
+        """
+        matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r" if mmap else None)
+        store = cls(matrix.shape[1], capacity=0)
+        store._buffer = matrix
+        store._ids = np.arange(len(matrix), dtype=np.int64)
+        store._alive = np.ones(len(matrix), dtype=bool)
+        store._size = store._next_id = len(matrix)
+        store._publish()
+        return store
+
+
+class TextBlob:
+    """
+    A read-only list of strings stored in two files:
+      offsets.npy — where each document starts (n + 1 int64 offsets)
+      texts.bin   — all documents' UTF-8 bytes, back to back
+    Both are memory-mapped, so a document is only decoded when you index it.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @staticmethod
+    def write(texts, path):
+        lengths = []
+        with open(os.path.join(path, "texts.bin"), "wb") as f:
+            for text in texts:
+                lengths.append(f.write(text.encode("utf-8")))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r" if mmap else None)
+        blob_path = os.path.join(path, "texts.bin")
+        if mmap and os.path.getsize(blob_path) > 0:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.fromfile(blob_path, dtype=np.uint8)
+        return cls(offsets, blob)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("TextBlob index out of range")
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class ChunkOrigins:
+    """
+    A read-only list of where each document came from, saved next to a TextBlob:
+      sources/  — a TextBlob of source names ("" when there is none)
+      spans.npy — (n, 2) int64 start/end char offsets, -1 when there are none
+    Item i is (source, start, end), or None for a document added as plain text.
+    """
+
+    def __init__(self, sources, spans):
+        self.sources = sources
+        self.spans = spans
+
+    @staticmethod
+    def write(origins, path):
+        origins = list(origins)
+        os.makedirs(os.path.join(path, "sources"), exist_ok=True)
+        TextBlob.write((o[0] if o else "" for o in origins), os.path.join(path, "sources"))
+        spans = np.array([o[1:] if o else (-1, -1) for o in origins], dtype=np.int64)
+        np.save(os.path.join(path, "spans.npy"), spans.reshape(-1, 2))
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        sources = TextBlob.open(os.path.join(path, "sources"), mmap=mmap)
+        return cls(sources, np.load(os.path.join(path, "spans.npy"), mmap_mode="r" if mmap else None))
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __getitem__(self, i):
+        start, end = self.spans[i]
+        return None if start < 0 else (self.sources[i], int(start), int(end))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+# ── A deterministic embedding layer ──────────────────────────────────────────
+# hash(text) is salted per process (PYTHONHASHSEED), so the same text gets a
+# different "embedding" in every worker, and np.random.seed() changes global
+# state other code relies on. blake2b is a stable content hash: same text →
+# same key in every process, on every machine, forever. That makes caching work.
+
+def text_key(text, namespace=""):
+    """Stable 16-byte key for a text (namespace = model name, so models don't collide)."""
+    return hashlib.blake2b(f"{namespace}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hash_embed_batch(texts, dim=64):
+    """
+    Fake embeddings for a whole batch at once, without any RNG object.
+    Each text's blake2b key is mixed with a counter per dimension (splitmix64),
+    giving uniform numbers that Box-Muller turns into Gaussian ones.
+    """
+    keys = np.array([int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little")
+                     for t in texts], dtype=np.uint64)
+    half = (dim + 1) // 2
+    counters = np.arange(1, 2 * half + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    z = keys[:, None] ^ counters[None, :]
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    u = ((z >> np.uint64(11)).astype(np.float64) + 0.5) / 2.0**53   # uniform in (0, 1)
+    radius = np.sqrt(-2 * np.log(u[:, :half]))
+    angle = 2 * np.pi * u[:, half:]
+    return np.hstack([radius * np.cos(angle), radius * np.sin(angle)])[:, :dim]
+
+
+class Embedder:
+    """
+    Wraps any batch embedding function with two caches:
+      - an in-memory LRU of the most recent `cache_size` texts
+      - an optional on-disk cache (cache_dir) shared by every process
+    In production pass embed_fn=model.encode; the default is hash_embed_batch.
+    """
+
+    def __init__(self, dim=64, embed_fn=None, namespace="hash-embed",
+                 cache_size=10_000, cache_dir=None):
+        self.dim = dim
+        self.embed_fn = embed_fn or (lambda texts: hash_embed_batch(texts, dim))
+        self.namespace = f"{namespace}-{dim}"
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()   # the LRU is shared by every thread that embeds
+        self.hits = self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _lookup(self, key):
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                return vector
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            vector = np.load(self._disk_path(key))
+            self._remember(key, vector)
+            return vector
+        return None
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._lru[key] = vector
+            if len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)   # evict least recently used
+
+    def _store(self, key, vector):
+        self._remember(key, vector)
+        if self.cache_dir and not os.path.exists(self._disk_path(key)):
+            tmp = f"{self._disk_path(key)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, vector)
+            os.replace(tmp, self._disk_path(key))   # atomic: other processes never see half a file
+
+    def embed_batch(self, texts):
+        """Embed many texts; only cache misses go to embed_fn, in one call."""
+        texts = list(texts)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = {}   # key → positions in `texts` (duplicates embedded once)
+        for i, text in enumerate(texts):
+            key = text_key(text, self.namespace)
+            vector = None if key in missing else self._lookup(key)
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                out[i] = vector
+        with self._lock:
+            self.hits += len(texts) - sum(len(p) for p in missing.values())
+            self.misses += len(missing)
+        if missing:
+            vectors = np.asarray(self.embed_fn([texts[p[0]] for p in missing.values()]),
+                                 dtype=np.float32)
+            for (key, positions), vector in zip(missing.items(), vectors):
+                out[positions] = vector
+                self._store(key, vector)
+        return out
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
 class SimpleRAG:
     """
     A minimal RAG system to understand the core concepts.
     Uses random embeddings for demo — in production, use sentence-transformers.
     """
 
-    def __init__(self):
+    def __init__(self, dim=64, embedder=None):
         self.documents = []
-        self.embeddings = []
+        self.origins = []   # origins[id]: (source, start, end) of an ingested chunk, else None
+        self.embedder = embedder or Embedder(dim)   # in real RAG: Embedder(dim, model.encode)
+        self.store = VectorStore(self.embedder.dim)
 
-    def _fake_embed(self, text):
-        """In real RAG, replace this with: model.encode(text)"""
-        np.random.seed(hash(text) % (2**32))
-        return np.random.randn(64)
+    def _writable_documents(self):
+        if not isinstance(self.documents, list):   # loaded from disk: copy on write
+            self.documents = list(self.documents)
+            self.origins = list(self.origins)
+        return self.documents
 
     def add_documents(self, docs):
-        """Index documents into the vector store."""
-        for doc in docs:
-            self.documents.append(doc)
-            self.embeddings.append(self._fake_embed(doc))
-        print(f"Indexed {len(docs)} documents. Total: {len(self.documents)}")
-
-    def retrieve(self, query, top_k=3):
-        """Find the most relevant documents for a query."""
-        query_embedding = self._fake_embed(query)
-        similarities = [
-            cosine_similarity(query_embedding, doc_emb)
-            for doc_emb in self.embeddings
-        ]
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        return [self.documents[i] for i in top_indices]
+        """Index documents into the vector store. Returns their ids."""
+        docs = list(docs)
+        ids = []
+        if docs:
+            ids = self.store.add(self.embedder.embed_batch(docs)).tolist()
+            self._writable_documents().extend(docs)   # documents[id] == text
+            self.origins.extend([None] * len(docs))
+        print(f"Indexed {len(docs)} documents. Total: {len(self.store)}")
+        return ids
+
+    def delete_documents(self, ids):
+        """Remove documents by id — a tombstone, no re-indexing."""
+        self.store.delete(ids)
+        for doc_id in np.atleast_1d(ids):
+            self._writable_documents()[doc_id] = None
+            self.origins[doc_id] = None
+
+    def update_document(self, doc_id, text):
+        """Replace a document's text and re-embed just that one document."""
+        self.store.update(doc_id, self.embedder.embed(text))
+        self._writable_documents()[doc_id] = text
+        self.origins[doc_id] = None   # the new text no longer matches those offsets
+
+    def compact(self, background=False):
+        """Reclaim the space of deleted documents' vectors (see VectorStore.compact)."""
+        return self.store.compact(background=background)
+
+    def retrieve(self, query, top_k=3, with_origins=False):
+        """
+        Find the most relevant documents for a query. with_origins=True returns
+        (text, (source, start, end)) pairs, origin None for plain-text documents.
+        """
+        top_ids, _ = self.store.search(self.embedder.embed(query), top_k)
+        if with_origins:
+            return [(self.documents[i], self.origins[i]) for i in top_ids]
+        return [self.documents[i] for i in top_ids]
+
+    def save(self, path):
+        """Persist the index so the next process doesn't re-embed everything."""
+        os.makedirs(path, exist_ok=True)
+        self.store.save(path)
+        live = self.store.live_ids()
+        TextBlob.write((self.documents[i] for i in live), path)
+        ChunkOrigins.write((self.origins[i] for i in live), path)
+
+    @classmethod
+    def load(cls, path, mmap=True, embedder=None):
+        """Warm start: map the saved files instead of re-embedding the corpus."""
+        store = VectorStore.load(path, mmap=mmap)
+        rag = cls(dim=store.dim, embedder=embedder)
+        rag.store = store
+        rag.documents = TextBlob.open(path, mmap=mmap)
+        rag.origins = ChunkOrigins.open(path, mmap=mmap)
+        return rag
+
+    def retrieve_many(self, queries, top_k=3):
+        """Batch version of retrieve: (ids, scores) arrays, one row per query."""
+        return self.store.search_many(self.embedder.embed_batch(queries), top_k)
+
+    def ingest(self, chunks, batch_size=256):
+        """
+        Index a (possibly endless) stream of chunks — see PART 5 — embedding
+        `batch_size` at a time, so memory stays flat however big the corpus.
+        """
+        total = 0
+        for batch in batched(chunks, batch_size):
+            texts = [chunk.text for chunk in batch]
+            self.store.add(self.embedder.embed_batch(texts))
+            self._writable_documents().extend(texts)
+            self.origins.extend((chunk.source, chunk.start, chunk.end) for chunk in batch)
+            total += len(texts)
+        print(f"Ingested {total} chunks. Total: {len(self.store)}")
+        return total
 
     def answer(self, query, top_k=3):
         """Retrieve context and build a prompt for an LLM."""
@@ -119,6 +596,66 @@ print(f"\nQuery: {query}")
 print(f"Retrieved docs: {docs}")
 print(f"\nPrompt that would be sent to LLM:\n{prompt}")
 
+# ── Why one matrix? ──────────────────────────────────────────────────────────
+# Looping over documents calls cosine_similarity once per doc in Python.
+# The matrix version does ONE matrix-vector product in optimized C/BLAS code.
+import time
+
+bench_vectors = np.random.default_rng(0).standard_normal((50_000, 64))
+bench_query = np.random.default_rng(1).standard_normal(64)
+bench_store = VectorStore(dim=64)
+bench_store.add(bench_vectors)
+
+start = time.perf_counter()
+loop_scores = [cosine_similarity(bench_query, v) for v in bench_vectors]
+loop_top = np.argsort(loop_scores)[::-1][:5]
+loop_time = time.perf_counter() - start
+
+start = time.perf_counter()
+matrix_top, _ = bench_store.search(bench_query, top_k=5)
+matrix_time = time.perf_counter() - start
+
+print(f"\nTop-5 over {len(bench_store):,} vectors:")
+print(f"  Python loop: {loop_time * 1000:.1f} ms")
+print(f"  Matrix:      {matrix_time * 1000:.1f} ms  (same results: {list(loop_top) == list(matrix_top)})")
+
+# ── Adding, deleting and updating without a rebuild ──────────────────────────
+doc_ids = rag.add_documents(["Matplotlib draws charts.", "Old fact about NumPy to be fixed."])
+rag.update_document(doc_ids[1], "NumPy arrays are stored in contiguous memory.")
+rag.delete_documents([doc_ids[0]])
+rag.compact(background=True).join()   # in a server, you wouldn't wait for it
+print(f"\nAfter add/update/delete/compact: {len(rag.store)} documents, "
+      f"ids still valid: {rag.documents[doc_ids[1]]!r}")
+
+# ── Many queries at once ─────────────────────────────────────────────────────
+# Evaluation sets have thousands of questions. One GEMM per block of queries
+# beats one matrix-vector product per query.
+bench_queries = np.random.default_rng(2).standard_normal((500, 64))
+
+start = time.perf_counter()
+one_by_one = [bench_store.search(q, top_k=5)[0] for q in bench_queries]
+single_time = time.perf_counter() - start
+
+start = time.perf_counter()
+batch_ids, _ = bench_store.search_many(bench_queries, top_k=5)
+batch_time = time.perf_counter() - start
+
+print(f"\n{len(bench_queries)} queries: one at a time {single_time * 1000:.0f} ms, "
+      f"batched {batch_time * 1000:.0f} ms (same results: {np.array_equal(one_by_one, batch_ids)})")
+# ── Save once, load instantly ────────────────────────────────────────────────
+# Re-embedding the whole corpus at every start-up is slow (and costs money with
+# a paid embedding API). Save the index once; later processes just map it.
+import tempfile
+
+with tempfile.TemporaryDirectory() as index_dir:
+    rag.save(index_dir)
+    start = time.perf_counter()
+    warm_rag = SimpleRAG.load(index_dir, mmap=True)
+    load_time = time.perf_counter() - start
+    print(f"\nLoaded saved index in {load_time * 1000:.2f} ms — "
+          f"same answer: {warm_rag.retrieve(query) == rag.retrieve(query)}")
+    del warm_rag  # release the memory map before the directory is removed
+
 # ══════════════════════════════════════════════════════
 # PART 3: PRODUCTION RAG WITH CHROMADB
 # ══════════════════════════════════════════════════════
@@ -180,4 +717,113 @@ EVALUATION:
 - Answer quality: is the final answer correct?
 """
 
+# ══════════════════════════════════════════════════════
+# PART 5: STREAMING INGESTION — CHUNKING BIG FILES
+# ══════════════════════════════════════════════════════
+"""
+add_documents() needs every document in memory as a string. A multi-GB
+corpus doesn't fit, so ingestion is a pipeline of GENERATORS (Module 4):
+
+  read_tokens()  → reads the file block by block, yields words + offsets
+  chunk_tokens() → sliding window: chunk_size tokens, `overlap` shared
+  batched()      → groups chunks so the embedder gets efficient batches
+  rag.ingest()   → embeds + indexes one batch at a time
+
+Only one block, one window and one batch are ever in memory.
+Tokens here are whitespace-separated words — close enough to count
+256-512 "tokens"; swap in a real tokenizer for exact model limits.
+"""
+import re
+from collections import deque, namedtuple
+from itertools import islice
+
+Chunk = namedtuple("Chunk", ["text", "source", "start", "end"])  # start/end: char offsets
+
+_WORD = re.compile(r"\S+")
+
+
+def read_tokens(path, block_size=1 << 16):
+    """Yield (token, start, end) from a text file without reading it all."""
+    offset = 0     # character offset of `pending` in the file
+    pending = ""
+    with open(path, encoding="utf-8") as f:
+        while block := f.read(block_size):
+            text = pending + block
+            last_end = 0
+            for match in _WORD.finditer(text):
+                if match.end() == len(text):   # may continue in the next block
+                    break
+                yield match.group(), offset + match.start(), offset + match.end()
+                last_end = match.end()
+            pending = text[last_end:]
+            offset += last_end
+    for match in _WORD.finditer(pending):
+        yield match.group(), offset + match.start(), offset + match.end()
+
+
+def chunk_tokens(tokens, source, chunk_size=256, overlap=50):
+    """Group tokens into overlapping chunks; each keeps its source and offsets."""
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    window = deque()
+    fresh = 0   # tokens not yet emitted in any chunk
+    for token in tokens:
+        window.append(token)
+        fresh += 1
+        if len(window) == chunk_size:
+            yield Chunk(" ".join(t[0] for t in window), source, window[0][1], window[-1][2])
+            for _ in range(chunk_size - overlap):
+                window.popleft()
+            fresh = 0
+    if fresh:
+        yield Chunk(" ".join(t[0] for t in window), source, window[0][1], window[-1][2])
+
+
+def iter_chunks(paths, chunk_size=256, overlap=50):
+    """Chunks from many files, lazily, one file after another."""
+    for path in paths:
+        yield from chunk_tokens(read_tokens(path), path, chunk_size, overlap)
+
+
+def batched(iterable, batch_size):
+    """[a, b, c, d, e] → [a, b], [c, d], [e] without materializing the input."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+# Demo: a ~2 MB file streams through with memory bounded by one block + one batch
+import tracemalloc
+
+with tempfile.TemporaryDirectory() as corpus_dir:
+    corpus_path = os.path.join(corpus_dir, "corpus.txt")
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        for i in range(40_000):
+            f.write(f"Sentence {i} talks about Python, NumPy and retrieval.\n")
+
+    first = next(iter_chunks([corpus_path]))
+    print(f"\nFirst chunk: chars {first.start}-{first.end} of {first.source!r}")
+    print(f"  {first.text[:70]}...")
+
+    tracemalloc.start()
+    streamed_rag = SimpleRAG()
+    streamed_rag.ingest(iter_chunks([corpus_path]), batch_size=128)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"File size: {os.path.getsize(corpus_path) / 1e6:.1f} MB, "
+          f"peak Python memory while ingesting: {peak / 1e6:.1f} MB (mostly the index itself)")
+
+    # Each chunk keeps its source and char offsets, through save/load too
+    probe = streamed_rag.documents[500]
+    hit_text, (source, hit_start, hit_end) = streamed_rag.retrieve(probe, top_k=1, with_origins=True)[0]
+    with open(source, encoding="utf-8") as f:
+        raw = f.read()[hit_start:hit_end]
+    streamed_rag.save(os.path.join(corpus_dir, "index"))
+    reloaded = SimpleRAG.load(os.path.join(corpus_dir, "index"))
+    _, reloaded_origin = reloaded.retrieve(probe, top_k=1, with_origins=True)[0]
+    print(f"Top hit: chars {hit_start}-{hit_end} of {os.path.basename(source)!r}, "
+          f"same words as the file: {raw.split() == hit_text.split()}, "
+          f"same origin after load: {reloaded_origin == (source, hit_start, hit_end)}")
+    del reloaded   # release the memory maps before the directory is removed
+
 print("\nDone! Move on to 02_agentic_workflows.py")
@@ -12,9 +12,13 @@ This is the foundation of systems like Claude Code, Cursor, and AutoGPT.
 CodePath AI110: "Explore agentic workflows"
 """
 
+import ast
+import functools
 import json
 from typing import Any
 
+import numpy as np
+
 # ══════════════════════════════════════════════════════
 # PART 1: UNDERSTANDING TOOL USE
 # ══════════════════════════════════════════════════════
@@ -62,6 +66,12 @@ TOOLS = [
                     "type": "integer",
                     "description": "Number of results to return",
                     "default": 3
+                },
+                "mode": {
+                    "type": "string",
+                    "enum": ["bm25", "vector", "hybrid"],
+                    "description": "Keyword, semantic, or combined ranking",
+                    "default": "hybrid"
                 }
             },
             "required": ["query"]
@@ -85,79 +95,555 @@ TOOLS = [
 
 # ── Tool Implementations ──────────────────────────────────────────────────────
 
-def calculator(expression: str) -> dict:
-    """Safe calculator — only allows math expressions."""
-    import ast
-    import operator
-
-    # Whitelist safe operations
-    safe_ops = {
-        ast.Add: operator.add,
-        ast.Sub: operator.sub,
-        ast.Mult: operator.mul,
-        ast.Div: operator.truediv,
-        ast.Pow: operator.pow,
-        ast.Mod: operator.mod,
-        ast.USub: operator.neg,
-    }
+# The calculator is compiled, not interpreted: the expression's AST is checked
+# against a whitelist ONCE, then turned into a code object with Python's own
+# compile(). Calls skip parsing and the tree walk, and a compiled expression
+# with variables runs over whole NumPy arrays at once (see evaluate_many).
 
-    def eval_expr(node):
+_SAFE_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load,
+               ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub)
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(expression: str, variables: tuple = ()):
+    """
+    Whitelist-check and compile a math expression. Only numbers, + - * / ** %,
+    unary minus and the names in `variables` are allowed — anything else (calls,
+    attributes, strings, ...) raises ValueError here, before anything runs.
+    Returns evaluate(**bindings). Cached, so a repeated expression compiles once.
+    """
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
         if isinstance(node, ast.Constant):
-            return node.value
-        elif isinstance(node, ast.BinOp):
-            return safe_ops[type(node.op)](eval_expr(node.left), eval_expr(node.right))
-        elif isinstance(node, ast.UnaryOp):
-            return safe_ops[type(node.op)](eval_expr(node.operand))
-        else:
+            if type(node.value) not in (int, float):
+                raise ValueError(f"Unsafe constant: {node.value!r}")
+        elif isinstance(node, ast.Name):
+            if node.id not in variables:
+                raise ValueError(f"Unknown variable: {node.id}")
+        elif not isinstance(node, _SAFE_NODES):
             raise ValueError(f"Unsafe operation: {type(node).__name__}")
+    code = compile(tree, "<calculator>", "eval")
+
+    def evaluate(**bindings):
+        return eval(code, {"__builtins__": {}}, bindings)   # safe: the tree was whitelisted
+    return evaluate
+
 
+def calculator(expression: str) -> dict:
+    """Safe calculator — only allows math expressions."""
     try:
-        tree = ast.parse(expression, mode='eval')
-        result = eval_expr(tree.body)
+        result = compile_expression(expression)()
         return {"result": result, "expression": expression}
     except Exception as e:
         return {"error": str(e)}
 
 
-def search_knowledge_base(query: str, top_k: int = 3) -> dict:
-    """Demo knowledge base search."""
-    kb = {
-        "numpy": "NumPy provides fast numerical computation. Use np.array() for arrays.",
-        "pandas": "Pandas provides DataFrames for data manipulation. Use pd.read_csv() to load data.",
-        "machine learning": "ML models learn patterns from data. Always split data into train/test.",
-        "RAG": "RAG = Retrieval Augmented Generation. Combines search with LLM generation.",
-        "neural network": "Neural networks have layers of interconnected nodes. Use backpropagation to train.",
-    }
-    results = [v for k, v in kb.items() if query.lower() in k.lower()][:top_k]
+def evaluate_many(expression: str, bindings: dict) -> np.ndarray:
+    """
+    Evaluate one expression over many rows: bindings maps each variable to an
+    array of values, e.g. evaluate_many("price * qty * (1 - discount)", columns).
+    The expression is compiled once and each operator runs once over whole arrays.
+    """
+    arrays = {name: np.asarray(values) for name, values in bindings.items()}
+    return np.asarray(compile_expression(expression, tuple(sorted(arrays)))(**arrays))
+
+
+# ── Keyword search: BM25 over an inverted index ───────────────────────────────
+# Scanning every document for every query is O(corpus). An INVERTED INDEX maps
+# each term to the documents containing it ("postings"), so a query only
+# touches the postings of its own terms. BM25 is the classic ranking formula:
+# rare terms (high IDF) count more, repeated terms saturate, long docs are
+# normalized. Everything that doesn't depend on the query is precomputed.
+
+import re
+import time
+import zlib
+from collections import Counter, defaultdict
+
+_TERM = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    return _TERM.findall(text.lower())
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Positions of the top_k scores, best first (argpartition: no full sort)."""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class BM25Index:
+    """Inverted index: term → (doc ids, BM25 weights) as compact NumPy arrays."""
+
+    def __init__(self, docs: list, k1: float = 1.5, b: float = 0.75):
+        self.docs = list(docs)
+        counts = defaultdict(list)  # term → [(doc_id, term frequency), ...]
+        lengths = np.zeros(len(self.docs), dtype=np.float32)
+        for doc_id, doc in enumerate(self.docs):
+            terms = tokenize(doc)
+            lengths[doc_id] = len(terms)
+            for term, tf in Counter(terms).items():
+                counts[term].append((doc_id, tf))
+
+        n_docs = len(self.docs)
+        norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0)) if n_docs else lengths
+        self.idf = {}
+        self.postings = {}
+        for term, plist in counts.items():
+            ids = np.fromiter((d for d, _ in plist), dtype=np.int32, count=len(plist))
+            tf = np.fromiter((t for _, t in plist), dtype=np.float32, count=len(plist))
+            self.idf[term] = np.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            self.postings[term] = (ids, (self.idf[term] * tf * (k1 + 1) / (tf + norm[ids])).astype(np.float32))
+
+    def search(self, query: str, top_k: int = 3) -> list:
+        """[(doc_id, score), ...] — cost depends on the query's postings, not the corpus."""
+        hits = [self.postings[t] for t in set(tokenize(query)) if t in self.postings]
+        if not hits:
+            return []
+        ids = np.concatenate([h[0] for h in hits])
+        weights = np.concatenate([h[1] for h in hits])
+        doc_ids, slots = np.unique(ids, return_inverse=True)
+        scores = np.bincount(slots, weights=weights)
+        return [(int(doc_ids[i]), float(scores[i])) for i in _top_k(scores, top_k)]
+
+
+# ── Vector search + hybrid fusion ─────────────────────────────────────────────
+# Keywords miss paraphrases ("arrays" vs "array"); embeddings miss exact names
+# and codes. Hybrid search runs both and fuses the RANKINGS with reciprocal
+# rank fusion (RRF): score(doc) = Σ 1 / (k + rank in each list). Ranks, not raw
+# scores, so BM25's unbounded scores and cosine's [-1, 1] mix fairly.
+
+def embed_text(text: str, dim: int = 256) -> np.ndarray:
+    """Stand-in embedding: hashed character trigrams (in production: a real model)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    padded = f" {text.lower()} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode()) % dim] += 1
+    return vector / max(np.linalg.norm(vector), 1e-9)
+
+
+class HybridSearch:
+    def __init__(self, docs: list, rrf_k: int = 60, min_similarity: float = 0.3):
+        self.docs = list(docs)
+        self.bm25 = BM25Index(self.docs)
+        self.vectors = np.zeros((len(self.docs), 256), dtype=np.float32)
+        for i, doc in enumerate(self.docs):
+            self.vectors[i] = embed_text(doc)
+        self.rrf_k = rrf_k
+        self.min_similarity = min_similarity
+
+    def vector_search(self, query: str, top_k: int = 3) -> list:
+        """
+        Like BM25, return only documents that match: hashed trigrams collide, so even
+        unrelated texts score ~0.1-0.25, and below min_similarity a hit is noise.
+        """
+        scores = self.vectors @ embed_text(query)
+        return [(int(i), float(scores[i])) for i in _top_k(scores, top_k)
+                if scores[i] > self.min_similarity]
+
+    def search(self, query: str, top_k: int = 3, mode: str = "hybrid") -> list:
+        """mode: "bm25", "vector" or "hybrid" (RRF of both). Returns [(doc_id, score)]."""
+        if mode == "bm25":
+            return self.bm25.search(query, top_k)
+        if mode == "vector":
+            return self.vector_search(query, top_k)
+        depth = max(50, 5 * top_k)   # fuse deeper lists than we return
+        fused = defaultdict(float)
+        for results in (self.bm25.search(query, depth), self.vector_search(query, depth)):
+            for rank, (doc_id, _) in enumerate(results, 1):
+                fused[doc_id] += 1 / (self.rrf_k + rank)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+KNOWLEDGE_BASE = [
+    "NumPy provides fast numerical computation. Use np.array() for arrays.",
+    "Pandas provides DataFrames for data manipulation. Use pd.read_csv() to load data.",
+    "ML models learn patterns from data. Always split data into train/test.",
+    "RAG = Retrieval Augmented Generation. Combines search with LLM generation.",
+    "Neural networks have layers of interconnected nodes. Use backpropagation to train.",
+]
+_kb_search = HybridSearch(KNOWLEDGE_BASE)
+
+
+def search_knowledge_base(query: str, top_k: int = 3, mode: str = "hybrid") -> dict:
+    """Search the course knowledge base (BM25, vector, or hybrid ranking)."""
+    results = [KNOWLEDGE_BASE[i] for i, _ in _kb_search.search(query, top_k, mode)]
     return {"query": query, "results": results or ["No results found"]}
 
 
+# ── Sandboxed code execution: a warm worker pool ──────────────────────────────
+# exec() in our own process is unsafe (the code shares our memory) and an
+# infinite loop hangs the agent. Each run_python call instead goes to a worker
+# PROCESS with limits:
+#   - CPU time (RLIMIT_CPU): a busy loop gets SIGXCPU and the run fails
+#   - memory (RLIMIT_AS): a huge allocation raises MemoryError in the worker
+#   - wall clock: if no reply arrives in time the worker is killed and replaced
+# Starting a Python interpreter costs tens of ms, so the workers are started
+# once and kept warm; a run costs one pipe round trip.
+# (Still not a full sandbox — production adds containers/seccomp: E2B, Docker.)
+
+import builtins
+import contextlib
+import io
+import math
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+
+try:
+    import resource   # POSIX only; elsewhere the workers run without OS limits
+except ImportError:
+    resource = None
+
+SANDBOX_BUILTINS = {name: getattr(builtins, name)
+                    for name in ("print", "range", "len", "sum", "min", "max", "abs", "round",
+                                 "sorted", "reversed", "enumerate", "zip", "map", "filter", "any",
+                                 "all", "list", "dict", "set", "tuple", "str", "int", "float",
+                                 "bool", "isinstance", "divmod", "pow", "repr",
+                                 "Exception", "ValueError", "TypeError", "ZeroDivisionError")}
+MAX_OUTPUT_CHARS = 65_536
+
+
+class CPULimitExceeded(BaseException):
+    """Raised by SIGXCPU; not an Exception, so sandboxed code can't `except Exception` it away."""
+
+
+def _on_sigxcpu(signum, frame):
+    raise CPULimitExceeded()
+
+
+def _sandbox_worker(conn, cpu_seconds: int, memory_mb: int):
+    """Worker process: run code strings from conn until sent None."""
+    if resource:
+        statm = "/proc/self/statm"   # current address-space size (Linux), so the limit is ON TOP of it
+        base = int(open(statm).read().split()[0]) * os.sysconf("SC_PAGE_SIZE") if os.path.exists(statm) else 0
+        if base:
+            resource.setrlimit(resource.RLIMIT_AS, (base + memory_mb * 2**20, resource.getrlimit(resource.RLIMIT_AS)[1]))
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+        cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    while (code := conn.recv()) is not None:
+        output = io.StringIO()
+        if resource:   # RLIMIT_CPU counts the process's whole life: allow cpu_seconds MORE
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            limit = math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds)
+            resource.setrlimit(resource.RLIMIT_CPU, (limit, cpu_hard))
+        try:
+            with contextlib.redirect_stdout(output):
+                exec(code, {"__builtins__": SANDBOX_BUILTINS})
+            reply = {"output": output.getvalue()[:MAX_OUTPUT_CHARS]}
+        except CPULimitExceeded:
+            reply = {"error": f"CPU time limit exceeded ({cpu_seconds}s)"}
+        except MemoryError:
+            reply = {"error": f"Memory limit exceeded ({memory_mb} MB)"}
+        except Exception as e:
+            reply = {"error": str(e) or type(e).__name__}
+        finally:
+            if resource:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+        conn.send(reply)
+    conn.close()
+
+
+class SandboxPool:
+    """
+    `size` warm worker processes. run(code) borrows an idle one (waiting if all are
+    busy, so concurrent tool calls just queue), sends the code over a pipe and waits
+    at most `timeout` seconds for {"output": ...} or {"error": ...}. A worker that
+    times out or dies is killed and replaced, so the pool always has `size` workers.
+    """
+
+    def __init__(self, size: int = 2, timeout: float = 5.0, cpu_seconds: int = 2,
+                 memory_mb: int = 256):
+        self.timeout, self.cpu_seconds, self.memory_mb = timeout, cpu_seconds, memory_mb
+        # forkserver forks workers from a single-threaded server process, never from a
+        # tool thread of this one; spawn where there is none (Windows). Both import this
+        # script, so its demos run under `if __name__ == "__main__"` only.
+        self._ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        conn, child = self._ctx.Pipe()
+        worker = self._ctx.Process(target=_sandbox_worker, daemon=True,
+                                   args=(child, self.cpu_seconds, self.memory_mb))
+        worker.start()
+        child.close()
+        return worker, conn
+
+    @staticmethod
+    def _kill(worker, conn):
+        worker.kill()
+        worker.join()
+        conn.close()
+
+    def run(self, code: str) -> dict:
+        worker, conn = self._idle.get()
+        healthy = False
+        try:
+            conn.send(code)
+            if conn.poll(self.timeout):
+                reply, healthy = conn.recv(), True
+            else:
+                reply = {"error": f"Timed out after {self.timeout:g}s"}
+        except (EOFError, OSError):   # the worker died (e.g. killed by the hard CPU limit)
+            reply = {"error": "Sandbox worker crashed"}
+        finally:
+            if not healthy:           # never hand a busy or dead worker to the next call
+                self._kill(worker, conn)
+                worker, conn = self._spawn()
+            self._idle.put((worker, conn))
+        return reply
+
+    def close(self):
+        while not self._idle.empty():
+            worker, conn = self._idle.get()
+            conn.send(None)
+            worker.join()
+            conn.close()
+
+
+_sandbox = None
+_sandbox_lock = threading.Lock()
+
+
 def run_python(code: str) -> dict:
-    """Execute Python code safely (demo — in production use a sandbox)."""
-    import io, contextlib
-    output = io.StringIO()
-    try:
-        with contextlib.redirect_stdout(output):
-            # WARNING: In production, NEVER exec() arbitrary code!
-            # Use a proper sandbox like E2B, Daytona, or Docker
-            exec(code, {"__builtins__": {}})  # minimal, still not fully safe
-        return {"output": output.getvalue()}
-    except Exception as e:
-        return {"error": str(e)}
+    """Execute Python code in a warm, resource-limited worker process."""
+    global _sandbox
+    with _sandbox_lock:   # started on first use: importing the lesson forks nothing
+        if _sandbox is None:
+            _sandbox = SandboxPool()
+    return _sandbox.run(code)
+
+
+# ── Tool result cache ─────────────────────────────────────────────────────────
+# Agents repeat themselves: the same lookup in turn 1 and turn 4, the same sum
+# in two sessions. A PURE tool (calculator) always returns the same result for
+# the same input, so it can be cached forever; a READ-ONLY tool (search) can be
+# cached for a while (until the data may have changed); a tool with SIDE
+# EFFECTS (run_python) must run every time. Each tool declares which it is.
+
+import inspect
+from collections import OrderedDict
+
+TOOL_FUNCTIONS = {
+    "calculator": calculator,
+    "search_knowledge_base": search_knowledge_base,
+    "run_python": run_python,
+}
+
+# tool → {"ttl": seconds (None = never expires), "max_entries": LRU bound}; None = don't cache
+CACHE_POLICIES = {
+    "calculator": {"ttl": None, "max_entries": 10_000},          # pure
+    "search_knowledge_base": {"ttl": 300, "max_entries": 1_000},  # read-only
+    "run_python": None,                                           # side effects
+}
+
+
+class ToolCache:
+    """
+    Per-tool LRU caches of tool results, keyed on the CANONICAL input: arguments
+    are bound to the tool's signature with defaults filled in, then serialized with
+    sorted keys — so {"query": "x"} and {"top_k": 3, "query": "x"} share an entry.
+    Error results are not cached. Cached results are shared: treat them as read-only.
+    """
+
+    def __init__(self, policies: dict, clock=time.monotonic):
+        self.policies = policies
+        self.clock = clock
+        self._entries = {name: OrderedDict() for name, policy in policies.items() if policy}
+        self._counts = {name: {"hits": 0, "misses": 0} for name in self._entries}
+        self._lock = threading.Lock()   # ToolExecutor calls tools from several threads
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _signature(fn) -> inspect.Signature:
+        return inspect.signature(fn)
+
+    def canonical_key(self, fn, tool_input: dict):
+        try:
+            bound = self._signature(fn).bind(**tool_input)
+            bound.apply_defaults()
+            return json.dumps(bound.arguments, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):  # bad arguments or unserializable values: don't cache
+            return None
+
+    def call(self, tool_name: str, tool_input: dict, fn) -> Any:
+        policy = self.policies.get(tool_name)
+        key = policy and self.canonical_key(fn, tool_input)
+        if not key:
+            return fn(**tool_input)
+
+        entries, counts = self._entries[tool_name], self._counts[tool_name]
+        with self._lock:
+            if key in entries:
+                result, expires = entries[key]
+                if expires is None or expires > self.clock():
+                    entries.move_to_end(key)
+                    counts["hits"] += 1
+                    return result
+                del entries[key]
+            counts["misses"] += 1
+
+        result = fn(**tool_input)               # outside the lock: tools can be slow
+        if not (isinstance(result, dict) and "error" in result):
+            expires = None if policy["ttl"] is None else self.clock() + policy["ttl"]
+            with self._lock:
+                entries[key] = (result, expires)
+                entries.move_to_end(key)
+                while len(entries) > policy["max_entries"]:
+                    entries.popitem(last=False)
+        return result
+
+    def clear(self, tool_name: str = None):
+        with self._lock:
+            for name in ([tool_name] if tool_name else self._entries):
+                self._entries[name].clear()
+
+    def stats(self) -> dict:
+        """{tool: {"hits", "misses", "hit_rate", "entries"}} for every cached tool."""
+        with self._lock:
+            return {name: {**c, "hit_rate": c["hits"] / max(c["hits"] + c["misses"], 1),
+                           "entries": len(self._entries[name])}
+                    for name, c in self._counts.items()}
+
+
+tool_cache = ToolCache(CACHE_POLICIES)
 
 
 # ── Tool Router ───────────────────────────────────────────────────────────────
 
 def execute_tool(tool_name: str, tool_input: dict) -> Any:
-    """Route tool calls to their implementations."""
-    tools = {
-        "calculator": calculator,
-        "search_knowledge_base": search_knowledge_base,
-        "run_python": run_python,
-    }
-    if tool_name not in tools:
+    """Route tool calls to their implementations (through the result cache)."""
+    if tool_name not in TOOL_FUNCTIONS:
         return {"error": f"Unknown tool: {tool_name}"}
-    return tools[tool_name](**tool_input)
+    return tool_cache.call(tool_name, tool_input, TOOL_FUNCTIONS[tool_name])
+
+
+# ── Parallel tool execution ───────────────────────────────────────────────────
+# One assistant turn can ask for several tools at once ("look up NumPy AND look
+# up Pandas"). They don't depend on each other, so running them one after
+# another wastes time: a turn with five 200 ms tools should take ~200 ms, not
+# 1 s. Tools mostly wait (HTTP, disk, subprocesses), so threads are enough.
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls of one turn concurrently on a shared thread pool.
+      - results come back in the same order as the calls (tool_result blocks
+        must line up with their tool_use blocks)
+      - each tool has a timeout (timeouts[name], else default_timeout); a call that
+        overruns gets an error result, so one hung tool can't stall the turn
+      - exceptions become {"error": ...} results, like execute_tool's own errors
+    A timed-out thread can't be killed; it finishes in the background and its
+    result is dropped.
+    """
+
+    def __init__(self, tool_fn=None, max_workers: int = 8, default_timeout: float = 30.0,
+                 timeouts: dict = None):
+        self.tool_fn = tool_fn or execute_tool
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def run(self, calls: list) -> list:
+        """calls: [(tool_name, tool_input), ...] → results in the same order."""
+        started = time.monotonic()
+        futures = [self._pool.submit(self.tool_fn, name, tool_input) for name, tool_input in calls]
+        results = []
+        for (name, _), future in zip(calls, futures):
+            limit = self.timeouts.get(name, self.default_timeout)
+            try:
+                results.append(future.result(timeout=max(0.0, started + limit - time.monotonic())))
+            except TimeoutError:
+                future.cancel()
+                results.append({"error": f"Tool '{name}' timed out after {limit:g}s"})
+            except Exception as e:
+                results.append({"error": str(e)})
+        return results
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    # Keyword lookups stay fast as the corpus grows: only matching postings are read
+    _rng = np.random.default_rng(0)
+    _vocab = np.array([f"term{i}" for i in range(20_000)])
+    big_index = BM25Index(" ".join(_vocab[_rng.zipf(1.3, 30) % len(_vocab)]) for _ in range(20_000))
+    start = time.perf_counter()
+    for _ in range(100):
+        big_index.search("term17 term4242 term999", top_k=5)
+    print(f"BM25 over {len(big_index.docs):,} docs: {(time.perf_counter() - start) * 10:.2f} ms/query")
+    print(search_knowledge_base("how do I load a csv with pandas?", top_k=1))
+    print(search_knowledge_base("zzzz qqqq"))   # nothing in common with any document
+
+    # Bulk calculations: compile once, run over NumPy columns
+    rows = 100_000
+    price, qty, discount = _rng.uniform(1, 100, rows), _rng.integers(1, 10, rows), _rng.uniform(0, 0.3, rows)
+    start = time.perf_counter()
+    per_row = [calculator(f"{p} * {q} * (1 - {d})")["result"] for p, q, d in zip(price[:10_000], qty, discount)]
+    per_row_us = (time.perf_counter() - start) / 10_000 * 1e6
+    order_total = compile_expression("price * qty * (1 - discount)", ("discount", "price", "qty"))
+    start = time.perf_counter()
+    compiled = [order_total(price=p, qty=q, discount=d) for p, q, d in zip(price[:10_000], qty, discount)]
+    compiled_us = (time.perf_counter() - start) / 10_000 * 1e6
+    start = time.perf_counter()
+    totals = evaluate_many("price * qty * (1 - discount)", {"price": price, "qty": qty, "discount": discount})
+    many_us = (time.perf_counter() - start) / rows * 1e6
+    print(f"calculator per row: {per_row_us:.1f} µs/row, compiled once: {compiled_us:.1f} µs/row, "
+          f"evaluate_many: {many_us:.3f} µs/row (same values: {np.allclose(per_row, totals[:10_000])})")
+    print(calculator("__import__('os').system('ls')"), calculator("'a' * 10"))
+
+
+# Warm sandbox: a pipe round trip per run instead of a new interpreter
+if __name__ == "__main__":
+    import subprocess
+    import sys
+    start = time.perf_counter()
+    for _ in range(5):
+        subprocess.run([sys.executable, "-c", "print(2 ** 10)"], capture_output=True)
+    spawn_ms = (time.perf_counter() - start) / 5 * 1000
+    run_python("print(2 ** 10)")   # first call starts the pool
+    start = time.perf_counter()
+    for _ in range(200):
+        result = run_python("print(2 ** 10)")
+    print(f"run_python: {(time.perf_counter() - start) / 200 * 1000:.2f} ms/run in a warm worker "
+          f"(new interpreter per run: {spawn_ms:.0f} ms) → {result}")
+    limited = SandboxPool(size=1, timeout=0.5, cpu_seconds=1, memory_mb=128)
+    print(" ", limited.run("big = [0] * 10**8"))
+    print(" ", limited.run("while True: pass"))         # wall clock: killed and replaced
+    limited.timeout = 5
+    print(" ", limited.run("while True: pass"))         # CPU limit: the worker survives
+    print(" ", limited.run("print('next run is fine')"))
+    limited.close()
+
+if __name__ == "__main__":
+    # Repeated tool calls across turns and sessions come from the cache
+    queries = ["numpy arrays", "pandas csv", "train test split"] * 100
+    start = time.perf_counter()
+    for q in queries:
+        search_knowledge_base(q)
+    uncached_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for q in queries:
+        execute_tool("search_knowledge_base", {"query": q})
+    cached_ms = (time.perf_counter() - start) * 1000
+    execute_tool("search_knowledge_base", {"query": "numpy arrays", "top_k": 3, "mode": "hybrid"})  # same key
+    for _ in range(3):
+        execute_tool("calculator", {"expression": "247.50 * 0.15"})
+    print(f"300 searches: {uncached_ms:.1f} ms direct, {cached_ms:.1f} ms through execute_tool")
+    for name, stats in tool_cache.stats().items():
+        print(f"  {name:<22} hits={stats['hits']:<4} misses={stats['misses']:<3} "
+              f"hit rate={stats['hit_rate']:.0%} entries={stats['entries']}")
 
 
 # ══════════════════════════════════════════════════════
@@ -177,8 +663,9 @@ class SimpleAgent:
     Replace the 'think' method with a real LLM API call.
     """
 
-    def __init__(self, tools):
+    def __init__(self, tools, executor: ToolExecutor = None):
         self.tools = tools
+        self.executor = executor or ToolExecutor()
         self.conversation = []
 
     def think(self, messages):
@@ -190,27 +677,24 @@ class SimpleAgent:
               messages=messages
           )
 
-        For demo, we simulate tool decisions.
+        For demo, we simulate tool decisions. Like the real API, one turn may
+        request several tools at once.
         """
-        last_msg = messages[-1]["content"]
-
-        if "calculate" in last_msg.lower() or any(c.isdigit() for c in last_msg):
-            return {
-                "type": "tool_use",
-                "tool": "calculator",
-                "input": {"expression": "247.50 * 0.15"}
-            }
-        elif "numpy" in last_msg.lower() or "pandas" in last_msg.lower():
-            return {
-                "type": "tool_use",
-                "tool": "search_knowledge_base",
-                "input": {"query": last_msg}
-            }
-        else:
-            return {
-                "type": "final_answer",
-                "content": "I can help you with calculations, knowledge lookups, and Python execution."
-            }
+        last_msg = messages[-1]["content"].lower()
+        calls = []
+
+        if "calculate" in last_msg or any(c.isdigit() for c in last_msg):
+            calls.append({"tool": "calculator", "input": {"expression": "247.50 * 0.15"}})
+        for topic in ("numpy", "pandas"):
+            if topic in last_msg:
+                calls.append({"tool": "search_knowledge_base", "input": {"query": topic, "top_k": 1}})
+
+        if calls:
+            return {"type": "tool_use", "calls": calls}
+        return {
+            "type": "final_answer",
+            "content": "I can help you with calculations, knowledge lookups, and Python execution."
+        }
 
     def run(self, user_message: str, max_turns: int = 5):
         """Run the agentic loop."""
@@ -225,31 +709,63 @@ class SimpleAgent:
                 return response["content"]
 
             elif response["type"] == "tool_use":
-                tool_name = response["tool"]
-                tool_input = response["input"]
-
-                print(f"[Agent using tool: {tool_name}({tool_input})]")
-                tool_result = execute_tool(tool_name, tool_input)
-                print(f"[Tool result: {tool_result}]")
-
-                # Add tool result to conversation
-                self.conversation.append({
-                    "role": "tool_result",
-                    "tool": tool_name,
-                    "result": tool_result
-                })
+                calls = [(call["tool"], call["input"]) for call in response["calls"]]
+                for tool_name, tool_input in calls:
+                    print(f"[Agent using tool: {tool_name}({tool_input})]")
+
+                # All of this turn's tools run at once; results stay in call order
+                tool_results = self.executor.run(calls)
+
+                for (tool_name, _), tool_result in zip(calls, tool_results):
+                    print(f"[Tool result: {tool_result}]")
+                    # Add tool result to conversation
+                    self.conversation.append({
+                        "role": "tool_result",
+                        "tool": tool_name,
+                        "result": tool_result
+                    })
 
                 # Synthesize final answer
-                answer = f"Used {tool_name}. Result: {tool_result}"
+                answer = " ".join(f"Used {name}. Result: {result}"
+                                  for (name, _), result in zip(calls, tool_results))
                 print(f"Agent: {answer}")
                 return answer
 
         return "Max turns reached"
 
 
-# Demo
-agent = SimpleAgent(TOOLS)
-agent.run("Can you calculate 15% of 247.50?")
+if __name__ == "__main__":
+    # Demo
+    agent = SimpleAgent(TOOLS)
+    agent.run("Can you calculate 15% of 247.50?")
+    agent.run("What do numpy and pandas do?")
+
+    # Five independent 200 ms tool calls in one turn: serial vs ToolExecutor
+    def slow_tool(tool_name, tool_input, latency=0.2):
+        time.sleep(latency)                    # stands in for an API call or a query
+        return execute_tool(tool_name, tool_input)
+
+    calls = [("calculator", {"expression": f"{i} * 1.5"}) for i in range(5)]
+    start = time.perf_counter()
+    serial = [slow_tool(name, tool_input) for name, tool_input in calls]
+    serial_s = time.perf_counter() - start
+    executor = ToolExecutor(tool_fn=slow_tool)
+    start = time.perf_counter()
+    parallel = executor.run(calls)
+    parallel_s = time.perf_counter() - start
+    print(f"\n5 tools x 200 ms: serial {serial_s * 1000:.0f} ms, parallel {parallel_s * 1000:.0f} ms, "
+          f"same results in order: {serial == parallel}")
+
+
+# A hung tool only costs its own timeout (its thread goes on to start the sandbox pool)
+if __name__ == "__main__":
+    hung = ToolExecutor(tool_fn=lambda name, tool_input: slow_tool(name, tool_input, latency=1.0)
+                        if name == "run_python" else execute_tool(name, tool_input),
+                        timeouts={"run_python": 0.3})
+    start = time.perf_counter()
+    print(hung.run([("run_python", {"code": "print(1)"}), ("calculator", {"expression": "2 ** 10"})]),
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    hung.shutdown()
 
 # ══════════════════════════════════════════════════════
 # PART 3: REAL ANTHROPIC TOOL USE
@@ -260,6 +776,8 @@ Real implementation with Anthropic API:
 import anthropic
 client = anthropic.Anthropic()
 
+executor = ToolExecutor()
+
 def run_agent(user_message):
     messages = [{"role": "user", "content": user_message}]
 
@@ -280,16 +798,19 @@ def run_agent(user_message):
             messages.append({"role": "assistant", "content": response.content})
             tool_results = []
 
-            for block in response.content:
-                if block.type == "tool_use":
-                    result = execute_tool(block.name, block.input)
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": block.id,
-                        "content": json.dumps(result)
-                    })
+            # Run every tool_use block of this turn concurrently (ToolExecutor
+            # returns results in block order, with per-tool timeouts)
+            blocks = [block for block in response.content if block.type == "tool_use"]
+            results = executor.run([(block.name, block.input) for block in blocks])
+            for block, result in zip(blocks, results):
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": json.dumps(result)
+                })
 
             messages.append({"role": "user", "content": tool_results})
 """
 
-print("\nDone! Move on to 03_fine_tuning.py")
+if __name__ == "__main__":
+    print("\nDone! Move on to 03_fine_tuning.py")
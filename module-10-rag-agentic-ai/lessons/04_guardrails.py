@@ -8,12 +8,144 @@ CodePath AI110: "guardrails for reliability and safety"
 """
 
 import re
-from typing import Optional
+from typing import Iterable, Iterator, Optional
+
+try:
+    from re import _parser as sre_parse   # Python 3.11+
+except ImportError:
+    import sre_parse
 
 # ══════════════════════════════════════════════════════
 # PART 1: INPUT VALIDATION GUARDRAILS
 # ══════════════════════════════════════════════════════
 
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def _expand_literals(pattern: str, limit: int = 64) -> Optional[list]:
+    """
+    All strings a pattern can match, if it only uses literals and (a|b) groups:
+    "pretend (you are|to be)" → ["pretend you are", "pretend to be"].
+    Returns None for anything else (\\d, *, [...], ...) or past `limit` variants.
+    """
+    pos = 0
+
+    def alternation():
+        nonlocal pos
+        options = sequence()
+        while options is not None and pos < len(pattern) and pattern[pos] == "|":
+            pos += 1
+            more = sequence()
+            options = None if more is None else options + more
+        return options
+
+    def sequence():
+        nonlocal pos
+        variants = [""]
+        while pos < len(pattern) and pattern[pos] not in "|)":
+            ch = pattern[pos]
+            if ch == "(":
+                pos += 1
+                if pattern.startswith("?:", pos):
+                    pos += 2
+                elif pattern.startswith("?", pos):
+                    return None                    # lookarounds, named groups, flags
+                inner = alternation()
+                if inner is None or pos >= len(pattern) or pattern[pos] != ")":
+                    return None
+                pos += 1
+                variants = [v + i for v in variants for i in inner]
+            elif ch == "\\" and pos + 1 < len(pattern) and not pattern[pos + 1].isalnum():
+                variants = [v + pattern[pos + 1] for v in variants]
+                pos += 2
+            elif ch in _REGEX_META:
+                return None
+            else:
+                variants = [v + ch for v in variants]
+                pos += 1
+            if len(variants) > limit:
+                return None
+        return variants
+
+    result = alternation()
+    return result if result is not None and pos == len(pattern) and all(result) else None
+
+
+def _uses_groups(pattern: str, flags: int = 0) -> bool:
+    """
+    True if the pattern has a named group or refers back to a group (\\1, (?P=name),
+    (?(1)...)). Backreferences count groups from the start of the WHOLE regex and
+    group names must be unique, so such a pattern can't be merged into another.
+    """
+    def refers_back(items) -> bool:
+        for op, av in items:
+            if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+                return True
+            for arg in av if isinstance(av, (tuple, list)) else (av,):
+                subpatterns = arg if isinstance(arg, list) else [arg]
+                if any(isinstance(sub, sre_parse.SubPattern) and refers_back(sub) for sub in subpatterns):
+                    return True
+        return False
+
+    return bool(re.compile(pattern, flags).groupindex) or refers_back(sre_parse.parse(pattern, flags))
+
+
+class PatternSet:
+    """
+    A blocklist compiled into ONE regex, so a text is scanned once, not once per pattern.
+      - Patterns that are just literals and (a|b) groups are expanded and merged into a
+        trie: "ignore (previous|all) instructions" and "ignore the rules" share "ignore ".
+        Each branch point is an alternation keyed by the next character, so the cost per
+        text position depends on the alphabet, not on how many patterns there are.
+      - Anything else (\\d, *, [...]) becomes a named-group alternative after the trie.
+      - Patterns with backreferences or named groups keep a regex of their own.
+    Every match ends in a named group, and m.lastgroup maps back to the rule that fired.
+    Case is left to the regex engine: str.lower() is not re.IGNORECASE ("İ" lowercases
+    to two characters, "ſ" stays as it is), and a guardrail must match what re.I does.
+    """
+    def __init__(self, patterns: list, flags: int = re.IGNORECASE):
+        self.patterns = list(patterns)
+        self._rule_of: dict = {}                   # group name → index into self.patterns
+        self._separate = []                        # (rule, regex) that can't be merged
+        trie: dict = {}
+        fallback = []
+        for rule, pattern in enumerate(self.patterns):
+            if _uses_groups(pattern, flags):
+                self._separate.append((rule, re.compile(pattern, flags)))
+                continue
+            literals = _expand_literals(pattern)
+            if literals is None:
+                fallback.append(self._group(rule, pattern))
+                continue
+            for literal in literals:
+                node = trie
+                for ch in literal:
+                    node = node.setdefault(ch, {})
+                node.setdefault("", rule)          # first rule to claim a string keeps it
+        branches = ([self._trie_regex(trie)] if trie else []) + fallback
+        self._regex = re.compile("|".join(branches) or "(?!)", flags)
+
+    def _group(self, rule: int, body: str = "") -> str:
+        name = f"r{len(self._rule_of)}"
+        self._rule_of[name] = rule
+        return f"(?P<{name}>{body})"
+
+    def _trie_regex(self, node: dict) -> str:
+        branches = [self._group(node[""])] if "" in node else []   # shortest match is enough
+        branches += [re.escape(ch) + self._trie_regex(child)
+                     for ch, child in sorted(node.items()) if ch]
+        return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+    def search(self, text: str) -> Optional[str]:
+        """The pattern of the first rule that matches (leftmost in the text), or None."""
+        m = self._regex.search(text)
+        best = (m.start(), self._rule_of[m.lastgroup]) if m else None
+        for rule, regex in self._separate:
+            if (m := regex.search(text)) and (best is None or (m.start(), rule) < best):
+                best = (m.start(), rule)
+        return self.patterns[best[1]] if best else None
+
+
 class InputGuardrails:
     """Validate and sanitize user inputs before sending to LLM."""
 
@@ -28,7 +160,7 @@ class InputGuardrails:
     ]
 
     def __init__(self):
-        self._compiled = [re.compile(p, re.IGNORECASE) for p in self.BLOCKED_PATTERNS]
+        self._blocklist = PatternSet(self.BLOCKED_PATTERNS)
 
     def check_length(self, text: str) -> Optional[str]:
         if len(text) > self.MAX_INPUT_LENGTH:
@@ -36,10 +168,9 @@ class InputGuardrails:
         return None
 
     def check_prompt_injection(self, text: str) -> Optional[str]:
-        """Detect prompt injection attempts."""
-        for pattern in self._compiled:
-            if pattern.search(text):
-                return f"Input contains disallowed pattern: '{pattern.pattern}'"
+        """Detect prompt injection attempts (one scan for the whole blocklist)."""
+        if rule := self._blocklist.search(text):
+            return f"Input contains disallowed pattern: '{rule}'"
         return None
 
     def validate(self, user_input: str) -> dict:
@@ -79,6 +210,56 @@ for inp in test_inputs:
     display = inp[:50] + ("..." if len(inp) > 50 else "")
     print(f"  [{status}] '{display}'")
 
+# Blocklists grow into the hundreds. One pattern at a time, a 4000-char input is
+# rescanned once per pattern; the compiled PatternSet scans it once.
+import random
+import time
+
+rng = random.Random(0)
+words = ["system", "prompt", "rules", "admin", "secret", "mode", "policy", "filter", "model",
+         "override", "reveal", "bypass", "disable", "forget", "print", "developer", "hidden",
+         "safety", "training", "guidelines", "context", "memory", "instructions", "previous"]
+text = " ".join(rng.choice(words + ["a", "to", "and", "please"]) for _ in range(800))[:4000]
+
+print("\n=== Blocklist scan: one search per pattern vs PatternSet ===")
+for n in (6, 60, 600):
+    patterns = InputGuardrails.BLOCKED_PATTERNS[:n]
+    while len(patterns) < n:
+        a, b, c = rng.sample(words, 3)
+        patterns.append(f"{a} (your|the|all) {b} {c}")
+    compiled = [re.compile(p, re.IGNORECASE) for p in patterns]
+    blocklist = PatternSet(patterns)
+    assert not any(p.search(text) for p in compiled) and blocklist.search(text) is None   # worst case: no hit
+
+    reps = max(3, 2_000 // n)   # a few ms per row of the table
+    start = time.perf_counter()
+    for _ in range(reps):
+        any(p.search(text) for p in compiled)
+    loop_us = (time.perf_counter() - start) / reps * 1e6
+    start = time.perf_counter()
+    for _ in range(reps):
+        blocklist.search(text)
+    set_us = (time.perf_counter() - start) / reps * 1e6
+    print(f"  {n:>3} patterns: per-pattern loop {loop_us:7.0f} µs   PatternSet {set_us:5.0f} µs")
+
+# Same verdict as re.search(p, text, re.I) per pattern, non-ASCII case pairs included
+# (long s "ſ" matches "s", dotted "İ" matches "i", the Kelvin sign "K" matches "k")
+guard = InputGuardrails()
+twins = {"s": "ſ", "i": "İ", "k": "K", "a": "A", "e": "E"}
+per_pattern = [re.compile(p, re.IGNORECASE) for p in InputGuardrails.BLOCKED_PATTERNS]
+phrases = ["ignore all instructions", "you are now", "pretend to be", "your real purpose",
+           "DAN mode", "jailbreak", "ask nicely", "kind instructions"]
+for _ in range(2_000):
+    text = "".join(twins.get(ch, ch) if rng.random() < 0.3 else ch for ch in rng.choice(phrases))
+    assert (guard._blocklist.search(text) is None) == (not any(p.search(text) for p in per_pattern)), text
+print(f"  2,000 case-mangled phrases: same verdict as per-pattern re.I "
+      f"(e.g. {guard.check_prompt_injection('İgnore all inſtructions')!r})")
+
+# A backreference counts groups from the start of the regex: such a rule keeps its own
+repeated = PatternSet([r"jailbreak", r"(\w+) \1 \1", r"(?P<word>\w+)-(?P=word)"])
+print(f"  repeated words: {repeated.search('say it again again again')!r}, "
+      f"{repeated.search('no no-no')!r}, {repeated.search('all fine')!r}")
+
 
 # ══════════════════════════════════════════════════════
 # PART 2: OUTPUT VALIDATION GUARDRAILS
@@ -87,17 +268,20 @@ for inp in test_inputs:
 class OutputGuardrails:
     """Validate LLM outputs before returning to user."""
 
-    SENSITIVE_PATTERNS = [
-        r"\b(?:\d{3}[-.\s]?){2}\d{4}\b",   # phone numbers
-        r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b",  # emails
-        r"\b\d{3}-\d{2}-\d{4}\b",           # SSN
-        r"\bsk-[A-Za-z0-9]{20,}\b",         # API keys (OpenAI style)
-        r"\b(password|secret|token)\s*[:=]\s*\S+",  # credentials
-    ]
+    SENSITIVE_PATTERNS = {
+        "phone":      r"\b(?:\d{3}[-.\s]?){2}\d{4}\b",
+        "email":      r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b",
+        "ssn":        r"\b\d{3}-\d{2}-\d{4}\b",
+        "api_key":    r"\bsk-[A-Za-z0-9]{20,}\b",         # OpenAI style
+        "credential": r"\b(password|secret|token)\s*[:=]\s*\S+",
+    }
 
     def __init__(self, max_length=2000):
         self.max_length = max_length
-        self._sensitive = [re.compile(p, re.IGNORECASE) for p in self.SENSITIVE_PATTERNS]
+        self._sensitive = [re.compile(p, re.IGNORECASE) for p in self.SENSITIVE_PATTERNS.values()]
+        # All categories in one alternation; m.lastgroup says which one matched
+        self._fused = re.compile("|".join(f"(?P<{name}>{p})" for name, p in self.SENSITIVE_PATTERNS.items()),
+                                 re.IGNORECASE)
 
     def check_sensitive_data(self, text: str) -> list:
         """Find potentially sensitive data in output."""
@@ -114,21 +298,167 @@ class OutputGuardrails:
             text = pattern.sub("[REDACTED]", text)
         return text
 
-    def validate(self, output: str) -> dict:
+    def redact_and_count(self, text: str) -> tuple[str, dict]:
+        """
+        Detect, count and redact in ONE left-to-right scan (check_sensitive_data followed
+        by redact_sensitive scans the text twice per pattern).
+        Returns (redacted_text, {category: count}) with only the categories found.
+        """
+        counts: dict = {}
+
+        def replace(m):
+            counts[m.lastgroup] = counts.get(m.lastgroup, 0) + 1
+            return "[REDACTED]"
+
+        return self._fused.sub(replace, text), counts
+
+    def _truncate(self, output: str) -> str:
         if len(output) > self.max_length:
             output = output[:self.max_length] + "... [truncated]"
+        return output
+
+    @staticmethod
+    def _result(output: str, redacted: str, counts: dict) -> dict:
+        if not counts:
+            return {"ok": True, "output": output}
+        return {
+            "ok": False,
+            "redacted": True,
+            "output": redacted,
+            "counts": counts,
+            "warning": f"Sensitive data detected and redacted: {sum(counts.values())} item(s)"
+        }
 
-        sensitive = self.check_sensitive_data(output)
-        if sensitive:
-            redacted = self.redact_sensitive(output)
-            return {
-                "ok": False,
-                "redacted": True,
-                "output": redacted,
-                "warning": f"Sensitive data detected and redacted: {len(sensitive)} item(s)"
-            }
-
-        return {"ok": True, "output": output}
+    def validate(self, output: str) -> dict:
+        output = self._truncate(output)
+        return self._result(output, *self.redact_and_count(output))
+
+    def validate_many(self, outputs: list) -> list:
+        """validate() for a batch of responses, one fused scan each."""
+        redact_and_count, result = self.redact_and_count, self._result
+        return [result(o, *redact_and_count(o)) for o in map(self._truncate, outputs)]
+
+    def redact_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """redact_sensitive for a token stream: yields redacted text as soon as it is safe."""
+        redactor = StreamingRedactor(list(self.SENSITIVE_PATTERNS.values()))
+        for chunk in chunks:
+            if safe := redactor.feed(chunk):
+                yield safe
+        if rest := redactor.flush():
+            yield rest
+
+
+# Streaming needs to know whether the end of the text so far could still turn into a
+# match ("john@exa" → "john@example.com"). Python's re has no partial matching, so we
+# derive a second regex from each pattern's parse tree that matches any PREFIX of a
+# possible match. It over-approximates (\b and lookarounds are dropped), which only
+# means holding back a little more than strictly necessary.
+_CATEGORIES = {sre_parse.CATEGORY_DIGIT: r"\d", sre_parse.CATEGORY_NOT_DIGIT: r"\D",
+               sre_parse.CATEGORY_SPACE: r"\s", sre_parse.CATEGORY_NOT_SPACE: r"\S",
+               sre_parse.CATEGORY_WORD: r"\w", sre_parse.CATEGORY_NOT_WORD: r"\W"}
+
+
+def _render(items) -> str:
+    """Parse tree → regex source, with groups made non-capturing and anchors dropped."""
+    out = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            out.append(re.escape(chr(av)))
+        elif op is sre_parse.NOT_LITERAL:
+            out.append(f"[^{re.escape(chr(av))}]")
+        elif op is sre_parse.ANY:
+            out.append(".")
+        elif op is sre_parse.IN:
+            parts = []
+            for set_op, set_av in av:
+                if set_op is sre_parse.NEGATE:
+                    parts.append("^")
+                elif set_op is sre_parse.LITERAL:
+                    parts.append(re.escape(chr(set_av)))
+                elif set_op is sre_parse.RANGE:
+                    parts.append(f"{re.escape(chr(set_av[0]))}-{re.escape(chr(set_av[1]))}")
+                else:
+                    parts.append(_CATEGORIES[set_av])
+            out.append(f"[{''.join(parts)}]")
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            lo, hi, sub = av
+            out.append(f"(?:{_render(sub)}){{{lo},{'' if hi is sre_parse.MAXREPEAT else hi}}}")
+        elif op is sre_parse.SUBPATTERN:
+            out.append(f"(?:{_render(av[-1])})")
+        elif op is sre_parse.BRANCH:
+            out.append(f"(?:{'|'.join(_render(b) for b in av[1])})")
+        elif op is sre_parse.GROUPREF:
+            out.append("(?s:.)*?")
+        # AT (\b, ^, $) and lookarounds: zero-width, dropped
+    return "".join(out)
+
+
+def _prefix(items) -> str:
+    """Regex for every prefix (empty and complete included) of what `items` can match."""
+    result = ""
+    for op, av in reversed(items):
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            lo, hi, sub = av
+            partial = f"(?:{_render(sub)}){{0,{'' if hi is sre_parse.MAXREPEAT else hi}}}(?:{_prefix(sub)})"
+        elif op is sre_parse.SUBPATTERN:
+            partial = _prefix(av[-1])
+        elif op is sre_parse.BRANCH:
+            partial = f"(?:{'|'.join(_prefix(b) for b in av[1])})"
+        else:
+            partial = ""                           # a single character: its only proper prefix is ""
+        result = f"(?:{_render([(op, av)])}{result}|{partial})"
+    return result
+
+
+class StreamingRedactor:
+    """
+    Incremental redact_sensitive. feed() takes chunks as the LLM produces them and returns
+    the text that is already safe to show; only the tail that could still complete a
+    sensitive match is held back (usually the last word). flush() releases the rest.
+      - the held tail starts at the leftmost position from which some pattern's prefix
+        regex reaches the end of the buffer
+      - complete matches before that point are final and get replaced
+      - at most max_hold characters are held, so a runaway token can't stall the stream
+    A few already-emitted characters stay in the buffer as left context, so \\b at the
+    start of a held tail sees the same neighbour it would in the full text.
+    """
+    CONTEXT = 32   # chars of emitted text kept for \\b and lookbehinds
+
+    def __init__(self, patterns: list, replacement: str = "[REDACTED]",
+                 flags: int = re.IGNORECASE, max_hold: int = 256):
+        self.replacement, self.max_hold = replacement, max_hold
+        self._regex = re.compile("|".join(f"(?:{p})" for p in patterns), flags)
+        prefixes = [_prefix(sre_parse.parse(p, flags)) for p in patterns]
+        self._viable = re.compile(f"(?:{'|'.join(prefixes)})\\Z", flags)
+        self._buf, self._pos = "", 0               # _buf[:_pos] is context, already emitted
+        self.redactions = 0
+
+    def _drain(self, cut: int) -> str:
+        buf, out, pos = self._buf, [], self._pos
+        for m in self._regex.finditer(buf, pos):
+            if m.end() > cut:                      # may still grow: hold it back whole
+                cut = min(cut, m.start())
+                break
+            out += [buf[pos:m.start()], self.replacement]
+            pos = m.end()
+            self.redactions += 1
+        out.append(buf[pos:cut])
+        keep = max(0, cut - self.CONTEXT)
+        self._buf, self._pos = buf[keep:], cut - keep
+        return "".join(out)
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        start = max(self._pos, len(self._buf) - self.max_hold)
+        return self._drain(self._viable.search(self._buf, start).start())
+
+    def flush(self) -> str:
+        return self._drain(len(self._buf))
+
+    @property
+    def held(self) -> int:
+        """Characters received but not yet emitted."""
+        return len(self._buf) - self._pos
 
 
 out_guard = OutputGuardrails()
@@ -145,9 +475,50 @@ for output in llm_outputs:
     if result["ok"]:
         print(f"  [PASS] '{output[:60]}'")
     else:
-        print(f"  [REDACTED] {result['warning']}")
+        print(f"  [REDACTED] {result['warning']} {result['counts']}")
         print(f"           Cleaned: '{result['output'][:60]}'")
 
+# Batches: 2 scans per pattern (findall + sub) vs one fused scan per response
+batch = [rng.choice(llm_outputs) + f" (ticket {i})" for i in range(2_000)]
+
+def two_pass(output):
+    if out_guard.check_sensitive_data(output):
+        return out_guard.redact_sensitive(output)
+    return output
+
+print("\n=== Output validation over 2,000 responses ===")
+timings = {}
+for name, run in [("findall + sub per pattern", lambda: [two_pass(o) for o in batch]),
+                  ("validate (fused scan)", lambda: [out_guard.validate(o) for o in batch]),
+                  ("validate_many", lambda: out_guard.validate_many(batch))]:
+    start = time.perf_counter()
+    timings[name] = run()
+    print(f"  {name:<26} {(time.perf_counter() - start) * 1000:6.1f} ms")
+assert [r["output"] for r in timings["validate_many"]] == [r["output"] for r in timings["validate (fused scan)"]]
+
+# Streaming: redact token by token instead of waiting for the whole response
+response = ("Sure! For billing questions email billing@example.com, or call 555-123-4567. "
+            "Your temporary key is sk-abc123xyz789def456ghi012jkl345mno, rotate it soon. " * 20)
+tokens = re.findall(r"\S{1,4}\s*", response)     # LLM-sized pieces
+
+print("\n=== Streaming Redaction ===")
+redactor = StreamingRedactor(list(OutputGuardrails.SENSITIVE_PATTERNS.values()))
+first_at, emitted, held = None, [], 0
+start = time.perf_counter()
+for i, token in enumerate(tokens):
+    if (safe := redactor.feed(token)) and first_at is None:
+        first_at = i
+    emitted.append(safe)
+    held = max(held, redactor.held)
+emitted.append(redactor.flush())
+per_token_us = (time.perf_counter() - start) / len(tokens) * 1e6
+streamed = "".join(emitted)
+print(f"  {len(tokens)} tokens, first text out after token {first_at} (raw stream: token 0)")
+print(f"  {per_token_us:.1f} µs per token, never held back more than {held} chars")
+print(f"  {redactor.redactions} redactions, same as full-string pass: "
+      f"{streamed == out_guard.redact_and_count(response)[0]}")
+print(f"  '{streamed[:90]}...'")
+
 
 # ══════════════════════════════════════════════════════
 # PART 3: STRUCTURED OUTPUT VALIDATION
@@ -180,6 +551,51 @@ def validate_llm_json(raw_output: str, required_keys: list, types: dict = None)
     return {"ok": True, "data": data}
 
 
+def compile_schema(required_keys: list, types: dict = None):
+    """
+    validate_llm_json specialized for one schema. The key and type checks are generated
+    as straight-line Python once, so a call does no looping over the schema:
+
+        if 'label' not in data or 'confidence' not in data: ...
+        if 'confidence' in data and not isinstance(data['confidence'], _type_0): ...
+
+    Returns a function raw_output → the same dicts validate_llm_json returns; its
+    .check attribute validates an already-parsed object.
+    """
+    namespace = {"loads": json.loads, "JSONDecodeError": json.JSONDecodeError}
+    required = [repr(k) for k in required_keys]
+    lines = [
+        "def validate(raw_output):",
+        "    try:",
+        "        data = loads(raw_output)",
+        "    except JSONDecodeError as e:",
+        "        return {'ok': False, 'error': f'Invalid JSON: {e}'}",
+        "    return check(data)",
+        "",
+        "def check(data):",
+        "    if type(data) is not dict:",
+        "        return {'ok': False, 'error': f'Expected a JSON object, got {type(data).__name__}'}",
+    ]
+    if required:
+        lines += [
+            f"    if {' or '.join(f'{k} not in data' for k in required)}:",
+            f"        missing = [k for k in ({', '.join(required)},) if k not in data]",
+            "        return {'ok': False, 'error': f'Missing keys: {missing}'}",
+        ]
+    for i, (key, expected_type) in enumerate((types or {}).items()):
+        namespace[f"_type_{i}"] = expected_type
+        prefix = f"Wrong type for '{key}': expected {expected_type.__name__}, got "
+        lines += [
+            f"    if {key!r} in data and not isinstance(data[{key!r}], _type_{i}):",
+            f"        return {{'ok': False, 'error': {prefix!r} + type(data[{key!r}]).__name__}}",
+        ]
+    lines.append("    return {'ok': True, 'data': data}")
+    exec("\n".join(lines), namespace)
+    validate = namespace["validate"]
+    validate.check = namespace["check"]
+    return validate
+
+
 # Test JSON validation
 test_outputs = [
     '{"label": "positive", "confidence": 0.9, "reasoning": "Great tone"}',
@@ -200,6 +616,55 @@ for raw in test_outputs:
     else:
         print(f"  [INVALID] {result['error']}")
 
+classification = compile_schema(["label", "confidence", "reasoning"],
+                                types={"confidence": float, "label": str})
+assert all(classification(raw) == validate_llm_json(raw, ["label", "confidence", "reasoning"],
+                                                    {"confidence": float, "label": str})
+           for raw in test_outputs)
+
+
+def validate_jsonl(lines, validator) -> tuple[list, list]:
+    """
+    Parse and validate a JSONL stream (a file object or any iterable of lines) with a
+    compile_schema validator. Returns (rows, errors): the valid objects, and
+    (line_number, line, error) for the rest. Blank lines are skipped.
+    Each line is parsed on its own. Joining lines into one JSON array would save
+    json.loads calls, but then a string or bracket left open on one line can swallow
+    the next, and two corrupt lines may parse as valid rows.
+    """
+    rows, errors = [], []
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        result = validator(line)
+        if result["ok"]:
+            rows.append(result["data"])
+        else:
+            errors.append((line_no, line, result["error"]))
+    return rows, errors
+
+labels = ["positive", "negative", "neutral"]
+stream = [json.dumps({"label": rng.choice(labels), "confidence": rng.random(), "reasoning": "tone"})
+          for _ in range(5_000)]
+stream[::1000] = ['{"label": "positive", "confidence": "high", "reasoning": "ok"}'] * len(stream[::1000])
+
+print("\n=== Validating 5,000 JSONL classification rows ===")
+start = time.perf_counter()
+interpreted = [validate_llm_json(line, ["label", "confidence", "reasoning"],
+                                 {"confidence": float, "label": str}) for line in stream]
+interpreted_s = time.perf_counter() - start
+start = time.perf_counter()
+rows, errors = validate_jsonl(stream, classification)
+compiled_s = time.perf_counter() - start
+print(f"  validate_llm_json per row: {len(stream) / interpreted_s:9,.0f} rows/s")
+print(f"  validate_jsonl (compiled): {len(stream) / compiled_s:9,.0f} rows/s "
+      f"— {len(rows):,} valid, {len(errors)} errors, first: line {errors[0][0]}: {errors[0][2]}")
+assert len(errors) == sum(not r["ok"] for r in interpreted)
+split_row = ['{"label": "a"}, {"label": "', 'b"}']   # each line is corrupt on its own
+rows, errors = validate_jsonl(split_row, classification)
+print(f"  two corrupt halves of a row: {len(rows)} valid, {len(errors)} errors")
+assert not rows and len(errors) == 2
+
 
 # ══════════════════════════════════════════════════════
 # PART 4: RESPONSIBLE AI PRINCIPLES